@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for the Snowflake MCP Client.
+
+Each MCP tool call is consumed as a long-lived SSE stream, so gevent workers
+are used to hold many in-flight streams per process instead of one OS thread
+each.
+
+Usage:
+    gunicorn -c gunicorn_conf.py mcp_client:app
+"""
+
+bind = '0.0.0.0:5000'
+workers = 4
+worker_class = 'gevent'
+worker_connections = 1000
+
+# SSE streams are long-lived; gevent workers heartbeat independently of requests
+timeout = 0
+keepalive = 75
+
+
+def post_worker_init(worker):
+    """Open the first MCP connection and run tool discovery before serving traffic"""
+    import mcp_client
+
+    try:
+        mcp_client.discover_tool_capabilities()
+    except Exception as e:
+        worker.log.warning(f"MCP warm-up failed, tools will be discovered on demand: {e}")
@@ -17,23 +17,80 @@ Set environment variables in .env file (see .env.example for template)
 """
 
 import os
-import json
+
+# Must run before requests/urllib3 are imported so their sockets are cooperative.
+# Not needed under `gunicorn -k gevent`, which patches before loading the app.
+if os.getenv('GEVENT_MONKEY'):
+    from gevent import monkey
+    monkey.patch_all()
+
+import re
+import sys
+import time
+import queue
+import itertools
+import threading
+import atexit
+import ssl
+import socket
 import logging
+import logging.handlers
+import certifi
+import orjson
 import requests
-from flask import Flask, render_template, request, jsonify, session
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+from flask import Flask, Response, render_template, request, jsonify
+from flask.json.provider import JSONProvider
+from werkzeug.exceptions import HTTPException
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-import uuid
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Any, Optional, Union
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# Hand records to a background listener so request threads never block on stderr
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+_log_queue = queue.SimpleQueue()
+_root_logger = logging.getLogger()
+_stream_handler = logging.StreamHandler(sys.stderr)
+_stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+_root_logger.handlers = [logging.handlers.QueueHandler(_log_queue)]
+_log_listener = logging.handlers.QueueListener(_log_queue, _stream_handler, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for faster jsonify/get_json"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # jsonify() path: hand orjson's bytes straight to the response instead of
+        # decoding to str for dumps() only for Werkzeug to encode it again
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)  # Compact, unsorted output (no key sort or indent)
+app.url_map.strict_slashes = False  # Serve /api/tools/ directly instead of a 308 redirect
 app.secret_key = os.environ.get('SECRET_KEY', 'mcp-client-dev-key-change-in-production')
 
 # ============================================================================
@@ -68,6 +125,18 @@ if MCP_SERVER_URL == 'https://your-account.snowflakecomputing.com/api/v2/databas
 if MCP_AUTH_TOKEN == 'your_bearer_token_here':
     logger.warning("⚠️ MCP_AUTH_TOKEN not configured! Please set in .env file")
 
+# Resolved once at import so request handlers never touch os.environ
+AUTH_HEADER = f'Bearer {MCP_AUTH_TOKEN}'
+
+MCP_HEADERS = MappingProxyType({
+    'Content-Type': 'application/json',
+    'Accept': 'application/json, text/event-stream',  # ← CRITICAL: Enable SSE streaming
+    'Authorization': AUTH_HEADER,
+    'Connection': 'keep-alive'
+})
+
+# Max pooled connections to the MCP host; match to gunicorn --workers × --threads
+MCP_POOL_SIZE = int(os.getenv('MCP_POOL_SIZE', '128'))
 
 # MCP Tool Names Configuration - these will be discovered dynamically
 # Default values (can be overridden by tool discovery)
@@ -76,6 +145,19 @@ MCP_ANALYST_TOOL = None # Tool for data analysis/SQL generation
 MCP_SQL_TOOL = None                      # Tool for SQL execution
 MCP_AGENT_TOOL = None                 # Tool for agent interactions
 
+# Response headers that carry request/trace IDs (lowercase for case-insensitive matching)
+TRACE_ID_HEADERS = frozenset({
+    'x-snowflake-request-id', 'x-request-id', 'x-trace-id', 'x-correlation-id',
+    'request-id', 'traceparent', 'tracestate'
+})
+
+# SQL keywords used to classify generated queries (group numbers below)
+_QUERY_TYPE_PATTERN = re.compile(
+    r"\b(?:(count)\s*\(|(group\s+by)\b|(select\s+distinct)\b)",
+    re.IGNORECASE
+)
+_COUNT, _GROUP_BY, _DISTINCT = 1, 2, 3
+
 # Tool type mappings for discovery
 TOOL_TYPE_MAPPINGS = {
     'CORTEX_SEARCH_SERVICE_QUERY': 'search',
@@ -84,185 +166,261 @@ TOOL_TYPE_MAPPINGS = {
     'CORTEX_AGENT_RUN': 'agent'
 }
 
+# ============================================================================
+# Shared HTTP Session
+# ============================================================================
+# One module-level session so every MCP call reuses pooled keep-alive
+# connections instead of paying a fresh TCP + TLS handshake per request.
+# pool_block=True makes callers wait for a free pooled connection under load
+# rather than opening throwaway sockets that each pay a TLS handshake.
+# POST is not in Retry's default allowed_methods, so tool calls are only
+# retried on connection failures, never re-sent after reaching the server.
+# TCP keepalive probes stop idle pooled connections (and quiet agent streams)
+# from being dropped by load balancers, so they stay reusable between calls.
+# The TLS context (with the CA bundle loaded) is built once per process and
+# shared by every connection in the pool.
+# ============================================================================
+
+_SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+_KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+if hasattr(socket, 'TCP_KEEPIDLE'):
+    _KEEPALIVE_SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15),
+    ]
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter with TCP keepalive and a shared, pre-loaded TLS context"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = _KEEPALIVE_SOCKET_OPTIONS
+        kwargs['ssl_context'] = _SSL_CONTEXT
+        super().init_poolmanager(*args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        if not url.lower().startswith('https'):
+            return
+        if verify is True:
+            # _SSL_CONTEXT already trusts the certifi bundle; leaving the path set
+            # would make urllib3 re-load it into the context on every new connection
+            conn.ca_certs = None
+            conn.ca_cert_dir = None
+        # verify=False or a custom CA bundle (e.g. REQUESTS_CA_BUNDLE) gets a
+        # per-connection context; urllib3 would otherwise apply those settings
+        # to the shared context and they would leak into every other connection
+        conn.conn_kw['ssl_context'] = _SSL_CONTEXT if verify is True else None
+
+
+_SESSION = requests.Session()
+_SESSION.headers.update(MCP_HEADERS)
+_SESSION.mount('https://', KeepAliveAdapter(
+    pool_connections=10,
+    pool_maxsize=MCP_POOL_SIZE,
+    pool_block=True,
+    max_retries=Retry(total=3, backoff_factor=0.1, status_forcelist=(502, 503, 504))
+))
+
+
+# JSON-RPC request ids; next() on a count is atomic, so safe across worker threads
+_RPC_IDS = itertools.count(1)
+
+
+def _debug_preview(data: Any) -> str:
+    """First 500 bytes of pretty-printed JSON, for DEBUG logs"""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2)[:500].decode(errors='ignore')
+
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session used for all MCP calls"""
+    return _SESSION
+
+
 class MCPClient:
     """Lightweight MCP Protocol Client for direct server communication"""
     
     def __init__(self):
         self.base_url = MCP_SERVER_URL
-        self.headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json, text/event-stream',  # ← CRITICAL: Enable SSE streaming
-            'Authorization': f'Bearer {MCP_AUTH_TOKEN}',
-            'Connection': 'keep-alive'
-        }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
-        # Configure session for long-running requests
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=10,
-            pool_maxsize=10,
-            max_retries=0,
-            pool_block=False
-        )
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        self.headers = MCP_HEADERS
+        self.session = get_session()
     
     def _make_rpc_call(self, method: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Make MCP JSON-RPC call to server"""
         payload = {
             "jsonrpc": "2.0",
-            "id": 12345,  # Use a simple integer ID like the working curl example
+            "id": next(_RPC_IDS),  # Unique integer per call so replies can't be confused
             "method": method,
             "params": params or {}
         }
         
+        body = orjson.dumps(payload)  # Serialized once; sent as-is below
+        
+        # Payload dumps, timings and trace IDs are only logged at INFO; skip that
+        # work (including the clock reads) otherwise
+        log_info = logger.isEnabledFor(logging.INFO)
+        log_debug = logger.isEnabledFor(logging.DEBUG)
+        
         try:
-            logger.info("=" * 80)
-            logger.info(f"📡 MCP RPC CALL: {method}")
-            logger.info("=" * 80)
-            logger.info(f"🔹 URL: {self.base_url}")
-            logger.info(f"🔹 Method: {method}")
-            logger.info(f"🔹 Params: {json.dumps(params, indent=2)}")
-            logger.info(f"🔹 Full Payload:\n{json.dumps(payload, indent=2)}")
-            logger.info(f"🔹 Payload Size: {len(json.dumps(payload))} bytes")
-            logger.info(f"🔹 Request Headers: {dict(self.session.headers)}")
-            logger.info(f"🔹 Timeout: 120 seconds")
-            logger.warning("⚠️ SSL verification is disabled - for testing only!")
+            # Only pay for pretty-printing the payload when INFO logs are emitted
+            if log_info:
+                logger.info("=" * 80)
+                logger.info(f"📡 MCP RPC CALL: {method}")
+                logger.info("=" * 80)
+                logger.info(f"🔹 URL: {self.base_url}")
+                logger.info(f"🔹 Method: {method}")
+                logger.info("🔹 Full Payload:\n%s", orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
+                logger.info(f"🔹 Payload Size: {len(body)} bytes")
+                logger.info(f"🔹 Request Headers: {dict(self.session.headers)}")
+                logger.info(f"🔹 Timeout: 120 seconds")
             
-            import time
-            start_time = time.time()
+            start_time = time.monotonic() if log_info else 0.0
             
             logger.info("🔹 Using stream=True + SSE to keep connection alive during long requests")
             
-            response = self.session.post(
+            # Context manager releases the connection when we're done: a fully read
+            # body goes back to the keep-alive pool, an unread one (e.g. parsing
+            # failed) has its socket closed rather than leaked
+            with self.session.post(
                 self.base_url, 
-                json=payload, 
+                data=body,  # Content-Type is set on the session
                 stream=True,  # ← CRITICAL: Keep connection alive
-                timeout=120,  # High timeout, streaming keeps connection active
-                verify=False  # Temporarily disable SSL verification for testing
-            )
-            
-            elapsed_to_headers = time.time() - start_time
-            logger.info("-" * 80)
-            logger.info(f"📥 RESPONSE HEADERS RECEIVED (after {elapsed_to_headers:.2f}s)")
-            logger.info("-" * 80)
-            logger.info(f"🔸 Status Code: {response.status_code}")
-            logger.info(f"🔸 Status Reason: {response.reason}")
-            logger.info(f"🔸 Elapsed Time: {response.elapsed.total_seconds():.2f} seconds")
+                timeout=120  # High timeout, streaming keeps connection active
+            ) as response:
             
-            # Log ALL headers with their exact keys (case-sensitive)
-            logger.info(f"🔸 ALL Response Headers (raw):")
-            for header_name, header_value in response.headers.items():
-                logger.info(f"   {header_name}: {header_value}")
+                elapsed = response.elapsed.total_seconds()
+                if log_info:
+                    elapsed_to_headers = time.monotonic() - start_time
+                    logger.info("-" * 80)
+                    logger.info(f"📥 RESPONSE HEADERS RECEIVED (after {elapsed_to_headers:.2f}s)")
+                    logger.info("-" * 80)
+                    logger.info(f"🔸 Status Code: {response.status_code}")
+                    logger.info(f"🔸 Status Reason: {response.reason}")
+                    logger.info(f"🔸 Elapsed Time: {elapsed:.2f} seconds")
             
-            # Check for various request/trace IDs in headers (try different variations)
-            possible_id_headers = [
-                'x-snowflake-request-id', 'X-Snowflake-Request-Id', 'X-SNOWFLAKE-REQUEST-ID',
-                'x-request-id', 'X-Request-Id', 'X-REQUEST-ID',
-                'x-trace-id', 'X-Trace-Id', 'X-TRACE-ID',
-                'x-correlation-id', 'X-Correlation-Id', 'X-CORRELATION-ID',
-                'request-id', 'Request-Id', 'REQUEST-ID',
-                'traceparent', 'tracestate'
-            ]
+                # Log ALL headers with their exact keys (case-sensitive)
+                if log_debug:
+                    logger.debug(f"🔸 ALL Response Headers (raw):")
+                    for header_name, header_value in response.headers.items():
+                        logger.debug(f"   {header_name}: {header_value}")
             
-            found_ids = {}
-            for header in possible_id_headers:
-                value = response.headers.get(header)
-                if value:
-                    found_ids[header] = value
-            
-            if found_ids:
-                logger.info(f"🆔 FOUND TRACE/REQUEST IDs:")
-                for id_name, id_value in found_ids.items():
-                    logger.info(f"   {id_name}: {id_value}")
-            else:
-                logger.warning("⚠️ NO REQUEST/TRACE IDs FOUND IN HEADERS")
+                # Check for request/trace IDs in headers (single case-insensitive pass)
+                if log_info:
+                    found_ids = {
+                        name: value for name, value in response.headers.items()
+                        if value and name.lower() in TRACE_ID_HEADERS
+                    }
+                
+                    if found_ids:
+                        logger.info(f"🆔 FOUND TRACE/REQUEST IDs:")
+                        for id_name, id_value in found_ids.items():
+                            logger.info(f"   {id_name}: {id_value}")
+                    else:
+                        logger.warning("⚠️ NO REQUEST/TRACE IDs FOUND IN HEADERS")
             
-            # ⚠️ DO NOT LOG RESPONSE BODY HERE - it will consume the stream!
-            # Body will be logged after processing in the streaming section below
+                # ⚠️ DO NOT LOG RESPONSE BODY HERE - it will consume the stream!
+                # Body will be logged after processing in the streaming section below
             
-            # Analyze the timeout
-            if response.status_code == 504:
-                logger.error("=" * 80)
-                logger.error("🚨 GATEWAY TIMEOUT ANALYSIS:")
-                logger.error(f"   • Request cut off after {response.elapsed.total_seconds():.2f} seconds")
-                logger.error(f"   • Response from: {response.headers.get('Server', 'unknown')}")
-                logger.error(f"   • This is a LOAD BALANCER timeout, not an application error")
-                logger.error(f"   • The agent is taking too long to respond (>50 seconds)")
-                logger.error(f"   • No request ID because request never reached MCP service")
-                logger.error("   • RECOMMENDATION: Check agent configuration in Snowflake")
-                logger.error("   • The agent may be:")
-                logger.error("     - Not properly configured")
-                logger.error("     - Timing out internally")
-                logger.error("     - Waiting on external dependencies")
-                logger.error("     - Running complex queries that take too long")
-                logger.error("=" * 80)
+                # Analyze the timeout
+                if response.status_code == 504:
+                    logger.error("=" * 80)
+                    logger.error("🚨 GATEWAY TIMEOUT ANALYSIS:")
+                    logger.error(f"   • Request cut off after {elapsed:.2f} seconds")
+                    logger.error(f"   • Response from: {response.headers.get('Server', 'unknown')}")
+                    logger.error(f"   • This is a LOAD BALANCER timeout, not an application error")
+                    logger.error(f"   • The agent is taking too long to respond (>50 seconds)")
+                    logger.error(f"   • No request ID because request never reached MCP service")
+                    logger.error("   • RECOMMENDATION: Check agent configuration in Snowflake")
+                    logger.error("   • The agent may be:")
+                    logger.error("     - Not properly configured")
+                    logger.error("     - Timing out internally")
+                    logger.error("     - Waiting on external dependencies")
+                    logger.error("     - Running complex queries that take too long")
+                    logger.error("=" * 80)
             
-            logger.info("=" * 80)
+                logger.info("=" * 80)
             
-            if response.status_code == 200:
-                # ✅ IMMEDIATELY start processing stream - DON'T read body for logging first!
-                logger.info("🔹 Processing response with stream support...")
-                body_read_start = time.time()
+                if response.status_code == 200:
+                    # ✅ IMMEDIATELY start processing stream - DON'T read body for logging first!
+                    logger.info("🔹 Processing response with stream support...")
+                    body_read_start = time.monotonic() if log_info else 0.0
                 
-                # Check Content-Type to determine if it's SSE or regular JSON
-                content_type = response.headers.get('Content-Type', '')
-                logger.info(f"🔹 Content-Type: {content_type}")
+                    # Check Content-Type to determine if it's SSE or regular JSON
+                    content_type = response.headers.get('Content-Type', '')
+                    logger.info(f"🔹 Content-Type: {content_type}")
                 
-                if 'text/event-stream' in content_type:
-                    # SSE format - process line by line to keep connection alive
-                    logger.info("🔹 Detected SSE stream, processing events...")
-                    result = None
-                    event_count = 0
+                    if 'text/event-stream' in content_type:
+                        # SSE format - process line by line to keep connection alive
+                        logger.info("🔹 Detected SSE stream, processing events...")
+                        result = None
+                        event_count = 0
+                        reply_found = False
                     
-                    for line in response.iter_lines(decode_unicode=True):
-                        if line:
-                            line = line.strip()
-                            event_count += 1
+                        # Read in 8 KiB chunks; the 512-byte default means many reads per large frame.
+                        # Lines stay as bytes: orjson decodes UTF-8 itself, so no separate decode pass
+                        for line in response.iter_lines(chunk_size=8192):
+                            # Once our reply is in, read the rest of the stream without parsing it;
+                            # leaving the body unread would close the socket instead of pooling it
+                            if reply_found:
+                                continue
+                            if line:
+                                event_count += 1
                             
-                            # Look for data lines which contain JSON
-                            if line.startswith("data: "):
-                                json_data = line[len("data: "):]
-                                try:
-                                    # Parse the JSON data from SSE
-                                    result = json.loads(json_data)
-                                    logger.info(f"✅ Parsed SSE data event #{event_count}")
-                                    # Log parsed data AFTER reading, not before
-                                    logger.debug(f"Parsed data: {json.dumps(result, indent=2)[:500]}...")
-                                except json.JSONDecodeError as e:
-                                    logger.warning(f"⚠️ Failed to parse SSE data: {e}")
+                                # Look for data lines which contain JSON
+                                if line.startswith(b"data: "):
+                                    try:
+                                        # Parse the JSON data from SSE (orjson ignores trailing whitespace)
+                                        result = orjson.loads(line[6:])
+                                        logger.info(f"✅ Parsed SSE data event #{event_count}")
+                                        # Log parsed data AFTER reading, not before
+                                        if log_debug:
+                                            logger.debug("Parsed data: %s...", _debug_preview(result))
+                                    except orjson.JSONDecodeError as e:
+                                        logger.warning(f"⚠️ Failed to parse SSE data: {e}")
+                                        continue
+                                    
+                                    # The reply to our request id is final - later frames can't replace it
+                                    if (isinstance(result, dict) and result.get('id') == payload['id']
+                                            and ('result' in result or 'error' in result)):
+                                        reply_found = True
                     
-                    body_read_time = time.time() - body_read_start
-                    total_time = time.time() - start_time
-                    logger.info(f"✅ SSE stream processed ({event_count} events) in {body_read_time:.2f}s (total: {total_time:.2f}s)")
+                        if log_info:
+                            body_read_time = time.monotonic() - body_read_start
+                            total_time = time.monotonic() - start_time
+                            logger.info(f"✅ SSE stream processed ({event_count} events) in {body_read_time:.2f}s (total: {total_time:.2f}s)")
                     
-                    if result is None:
-                        raise Exception("No valid JSON data found in SSE stream")
-                else:
-                    # Regular JSON response - only call json() for non-streaming responses
-                    logger.info("🔹 Regular JSON response, reading all...")
-                    result = response.json()  # ✅ Only call json() here for non-streaming
-                    body_read_time = time.time() - body_read_start
-                    total_time = time.time() - start_time
-                    logger.info(f"✅ JSON response read in {body_read_time:.2f}s (total: {total_time:.2f}s)")
-                    # Log the result AFTER reading
-                    logger.debug(f"Response data: {json.dumps(result, indent=2)[:500]}...")
+                        if result is None:
+                            raise Exception("No valid JSON data found in SSE stream")
+                    else:
+                        # Regular JSON response - only call json() for non-streaming responses
+                        logger.info("🔹 Regular JSON response, reading all...")
+                        result = orjson.loads(response.content)  # ✅ Only read the body here for non-streaming
+                        if log_info:
+                            body_read_time = time.monotonic() - body_read_start
+                            total_time = time.monotonic() - start_time
+                            logger.info(f"✅ JSON response read in {body_read_time:.2f}s (total: {total_time:.2f}s)")
+                        # Log the result AFTER reading
+                        if log_debug:
+                            logger.debug("Response data: %s...", _debug_preview(result))
                 
-                # Process the final result
-                if 'result' in result:
-                    logger.info(f"✅ MCP Call successful: {method}")
-                    # Log final result summary
-                    logger.info(f"🔸 Result type: {type(result['result'])}")
-                    return result['result']
-                elif 'error' in result:
-                    logger.error(f"❌ MCP Error: {result['error']}")
-                    raise Exception(f"MCP Error: {result['error']}")
+                    # Process the final result
+                    if 'result' in result:
+                        logger.info(f"✅ MCP Call successful: {method}")
+                        # Log final result summary
+                        logger.info(f"🔸 Result type: {type(result['result'])}")
+                        return result['result']
+                    elif 'error' in result:
+                        logger.error(f"❌ MCP Error: {result['error']}")
+                        raise Exception(f"MCP Error: {result['error']}")
+                    else:
+                        logger.error(f"❌ Unexpected response format")
+                        raise Exception(f"Unexpected response format")
                 else:
-                    logger.error(f"❌ Unexpected response format")
-                    raise Exception(f"Unexpected response format")
-            else:
-                logger.error(f"❌ HTTP Error {response.status_code}: {response.text}")
-                raise Exception(f"HTTP {response.status_code}: {response.text}")
+                    logger.error(f"❌ HTTP Error {response.status_code}: {response.text}")
+                    raise Exception(f"HTTP {response.status_code}: {response.text}")
                 
         except requests.RequestException as e:
             logger.error(f"❌ Request failed: {e}")
@@ -281,24 +439,29 @@ class MCPClient:
         }
         return self._make_rpc_call("tools/call", params)
 
+def iter_text_content(result: Dict[str, Any]) -> Iterator[str]:
+    """Yield the text payload of each text item in an MCP tool result"""
+    content = result.get('content')
+    if isinstance(content, list):
+        for item in content:
+            if item.get('type') == 'text' and 'text' in item:
+                yield item['text']
+
 def parse_analyst_result(result: Dict[str, Any], query: str) -> Dict[str, Any]:
     """Parse the analyst result to extract SQL and provide formatted output"""
     try:
         # Extract SQL from the analyst result
         sql_statement = None
-        if 'content' in result and isinstance(result['content'], list):
-            for item in result['content']:
-                if item.get('type') == 'text' and 'text' in item:
-                    # The text contains JSON with the SQL statement
-                    text_content = item['text']
-                    try:
-                        parsed_json = json.loads(text_content)
-                        if 'statement' in parsed_json:
-                            sql_statement = parsed_json['statement']
-                            break
-                    except json.JSONDecodeError:
-                        # If not JSON, treat as plain text
-                        sql_statement = text_content
+        # The text items contain JSON with the SQL statement
+        for text_content in iter_text_content(result):
+            try:
+                parsed_json = orjson.loads(text_content)
+                if 'statement' in parsed_json:
+                    sql_statement = parsed_json['statement']
+                    break
+            except orjson.JSONDecodeError:
+                # If not JSON, treat as plain text
+                sql_statement = text_content
         
         if not sql_statement:
             return {
@@ -333,12 +496,13 @@ def parse_analyst_result(result: Dict[str, Any], query: str) -> Dict[str, Any]:
 
 def determine_query_type(sql: str) -> str:
     """Determine the type of SQL query"""
-    sql_lower = sql.lower()
-    if 'count(' in sql_lower and 'group by' in sql_lower:
+    # Single case-insensitive pass; lastindex identifies which keyword matched
+    found = {match.lastindex for match in _QUERY_TYPE_PATTERN.finditer(sql)}
+    if _COUNT in found and _GROUP_BY in found:
         return 'aggregation'
-    elif 'select distinct' in sql_lower:
+    elif _DISTINCT in found:
         return 'distinct'
-    elif 'count(' in sql_lower:
+    elif _COUNT in found:
         return 'count'
     else:
         return 'select'
@@ -350,48 +514,45 @@ def parse_sql_result(result: Dict[str, Any], sql_query: str) -> Dict[str, Any]:
         execution_results = []
         result_metadata = None
         
-        if 'content' in result and isinstance(result['content'], list):
-            for item in result['content']:
-                if item.get('type') == 'text' and 'text' in item:
-                    # Parse the nested JSON response from Snowflake
-                    text_content = item['text']
-                    try:
-                        snowflake_response = json.loads(text_content)
-                        
-                        # Extract result_set from Snowflake response
-                        if 'result_set' in snowflake_response:
-                            result_set = snowflake_response['result_set']
-                            
-                            # Get column metadata
-                            if 'resultSetMetaData' in result_set and 'rowType' in result_set['resultSetMetaData']:
-                                result_metadata = {
-                                    'columns': [col['name'] for col in result_set['resultSetMetaData']['rowType']],
-                                    'num_rows': result_set['resultSetMetaData'].get('numRows', 0)
-                                }
-                            
-                            # Get data rows
-                            if 'data' in result_set and isinstance(result_set['data'], list):
-                                # Convert array rows to dictionary format for display
-                                if result_metadata and result_metadata['columns']:
-                                    for row in result_set['data']:
-                                        if isinstance(row, list) and len(row) == len(result_metadata['columns']):
-                                            row_dict = {}
-                                            for i, col_name in enumerate(result_metadata['columns']):
-                                                row_dict[col_name] = row[i] if i < len(row) else None
-                                            execution_results.append(row_dict)
-                                else:
-                                    # Fallback: treat as generic rows
-                                    for i, row in enumerate(result_set['data']):
-                                        if isinstance(row, list):
-                                            row_dict = {f'column_{j}': val for j, val in enumerate(row)}
-                                            execution_results.append(row_dict)
+        for text_content in iter_text_content(result):
+            # Parse the nested JSON response from Snowflake
+            try:
+                snowflake_response = orjson.loads(text_content)
+                
+                # Extract result_set from Snowflake response
+                if 'result_set' in snowflake_response:
+                    result_set = snowflake_response['result_set']
+                    
+                    # Get column metadata
+                    if 'resultSetMetaData' in result_set and 'rowType' in result_set['resultSetMetaData']:
+                        result_metadata = {
+                            'columns': [col['name'] for col in result_set['resultSetMetaData']['rowType']],
+                            'num_rows': result_set['resultSetMetaData'].get('numRows', 0)
+                        }
+                    
+                    # Get data rows
+                    if 'data' in result_set and isinstance(result_set['data'], list):
+                        # Convert array rows to dictionary format for display
+                        if result_metadata and result_metadata['columns']:
+                            columns = result_metadata['columns']
+                            num_columns = len(columns)
+                            execution_results.extend(
+                                dict(zip(columns, row)) for row in result_set['data']
+                                if isinstance(row, list) and len(row) == num_columns
+                            )
                         else:
-                            # Fallback: treat entire response as result
-                            execution_results.append(snowflake_response)
-                            
-                    except json.JSONDecodeError:
-                        # If not JSON, treat as plain text result
-                        execution_results.append({'result': text_content})
+                            # Fallback: treat as generic rows
+                            for i, row in enumerate(result_set['data']):
+                                if isinstance(row, list):
+                                    row_dict = {f'column_{j}': val for j, val in enumerate(row)}
+                                    execution_results.append(row_dict)
+                else:
+                    # Fallback: treat entire response as result
+                    execution_results.append(snowflake_response)
+                    
+            except orjson.JSONDecodeError:
+                # If not JSON, treat as plain text result
+                execution_results.append({'result': text_content})
         
         return {
             'type': 'sql_execution',
@@ -417,11 +578,7 @@ def parse_agent_result(result: Dict[str, Any], message: str) -> Dict[str, Any]:
     """Parse agent result to extract response and provide formatted output"""
     try:
         # Extract agent response
-        agent_response = ""
-        if 'content' in result and isinstance(result['content'], list):
-            for item in result['content']:
-                if item.get('type') == 'text' and 'text' in item:
-                    agent_response += item['text'] + "\n"
+        agent_response = "\n".join(iter_text_content(result))
         
         if not agent_response:
             agent_response = str(result)
@@ -446,6 +603,10 @@ def parse_agent_result(result: Dict[str, Any], message: str) -> Dict[str, Any]:
 # Global MCP client instance
 mcp_client = MCPClient()
 
+# Compile the UI template at startup so the first page load skips parsing.
+# Jinja only re-stats templates when auto-reload is on (debug mode).
+app.jinja_env.get_template('mcp_client.html')
+
 @app.route('/')
 def index():
     """Main MCP client interface"""
@@ -473,76 +634,98 @@ def list_tools():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+# Discovered capabilities are reused for TOOL_CACHE_TTL seconds; the lock makes
+# concurrent page loads wait for one discovery call instead of each running it
+TOOL_CACHE_TTL = 300
+_TOOL_CACHE = TTLCache(maxsize=1, ttl=TOOL_CACHE_TTL)
+_TOOL_CACHE_LOCK = threading.Lock()
+
+def discover_tool_capabilities(refresh: bool = False) -> Dict[str, Any]:
+    """Return cached tool capabilities, running discovery when stale or refresh is requested"""
+    with _TOOL_CACHE_LOCK:
+        if not refresh and 'capabilities' in _TOOL_CACHE:
+            return _TOOL_CACHE['capabilities']
+        tool_capabilities = _discover_tool_capabilities()
+        _TOOL_CACHE['capabilities'] = tool_capabilities
+        return tool_capabilities
+
+def _discover_tool_capabilities() -> Dict[str, Any]:
+    """Discover available tools, map them to capabilities and update the global tool names"""
+    logger.info("🔍 Discovering available MCP tools...")
+    tools = mcp_client.list_tools()
+    
+    # Map tools to capabilities
+    tool_capabilities = {
+        'search': None,
+        'analyst': None,
+        'sql': None,
+        'agent': None
+    }
+    
+    # Extract tool types from inputSchema if available
+    for tool in tools:
+        tool_name = tool.get('name', '')
+        tool_description = tool.get('description', '')
+        
+        # Try to determine tool type from inputSchema or description
+        input_schema = tool.get('inputSchema', {})
+        properties = input_schema.get('properties', {})
+        
+        # Determine tool type based on properties and description
+        if 'query' in properties and 'columns' in properties:
+            # Search tool
+            tool_capabilities['search'] = {
+                'name': tool_name,
+                'description': tool_description,
+                'type': 'CORTEX_SEARCH_SERVICE_QUERY',
+                'available': True
+            }
+        elif 'message' in properties and 'semantic' in tool_description.lower():
+            # Analyst tool
+            tool_capabilities['analyst'] = {
+                'name': tool_name,
+                'description': tool_description,
+                'type': 'CORTEX_ANALYST_MESSAGE',
+                'available': True
+            }
+        elif 'sql' in properties:
+            # SQL execution tool
+            tool_capabilities['sql'] = {
+                'name': tool_name,
+                'description': tool_description,
+                'type': 'SYSTEM_EXECUTE_SQL',
+                'available': True
+            }
+        elif 'text' in properties and ('agent' in tool_description.lower() or 'agent' in tool_name.lower()):
+            # Agent tool
+            tool_capabilities['agent'] = {
+                'name': tool_name,
+                'description': tool_description,
+                'type': 'CORTEX_AGENT_RUN',
+                'available': True
+            }
+    
+    # Update global tool names
+    global MCP_SEARCH_TOOL, MCP_ANALYST_TOOL, MCP_SQL_TOOL, MCP_AGENT_TOOL
+    if tool_capabilities['search']:
+        MCP_SEARCH_TOOL = tool_capabilities['search']['name']
+    if tool_capabilities['analyst']:
+        MCP_ANALYST_TOOL = tool_capabilities['analyst']['name']
+    if tool_capabilities['sql']:
+        MCP_SQL_TOOL = tool_capabilities['sql']['name']
+    if tool_capabilities['agent']:
+        MCP_AGENT_TOOL = tool_capabilities['agent']['name']
+    
+    logger.info(f"✅ Tool discovery complete: Search={MCP_SEARCH_TOOL}, Analyst={MCP_ANALYST_TOOL}, SQL={MCP_SQL_TOOL}, Agent={MCP_AGENT_TOOL}")
+    
+    return tool_capabilities
+
 @app.route('/api/tools/discover')
 def discover_tools():
     """Discover available tools and map them to client capabilities"""
     try:
-        logger.info("🔍 Discovering available MCP tools...")
-        tools = mcp_client.list_tools()
-        
-        # Map tools to capabilities
-        tool_capabilities = {
-            'search': None,
-            'analyst': None,
-            'sql': None,
-            'agent': None
-        }
-        
-        # Extract tool types from inputSchema if available
-        for tool in tools:
-            tool_name = tool.get('name', '')
-            tool_description = tool.get('description', '')
-            
-            # Try to determine tool type from inputSchema or description
-            input_schema = tool.get('inputSchema', {})
-            properties = input_schema.get('properties', {})
-            
-            # Determine tool type based on properties and description
-            if 'query' in properties and 'columns' in properties:
-                # Search tool
-                tool_capabilities['search'] = {
-                    'name': tool_name,
-                    'description': tool_description,
-                    'type': 'CORTEX_SEARCH_SERVICE_QUERY',
-                    'available': True
-                }
-            elif 'message' in properties and 'semantic' in tool_description.lower():
-                # Analyst tool
-                tool_capabilities['analyst'] = {
-                    'name': tool_name,
-                    'description': tool_description,
-                    'type': 'CORTEX_ANALYST_MESSAGE',
-                    'available': True
-                }
-            elif 'sql' in properties:
-                # SQL execution tool
-                tool_capabilities['sql'] = {
-                    'name': tool_name,
-                    'description': tool_description,
-                    'type': 'SYSTEM_EXECUTE_SQL',
-                    'available': True
-                }
-            elif 'text' in properties and ('agent' in tool_description.lower() or 'agent' in tool_name.lower()):
-                # Agent tool
-                tool_capabilities['agent'] = {
-                    'name': tool_name,
-                    'description': tool_description,
-                    'type': 'CORTEX_AGENT_RUN',
-                    'available': True
-                }
-        
-        # Update global tool names
-        global MCP_SEARCH_TOOL, MCP_ANALYST_TOOL, MCP_SQL_TOOL, MCP_AGENT_TOOL
-        if tool_capabilities['search']:
-            MCP_SEARCH_TOOL = tool_capabilities['search']['name']
-        if tool_capabilities['analyst']:
-            MCP_ANALYST_TOOL = tool_capabilities['analyst']['name']
-        if tool_capabilities['sql']:
-            MCP_SQL_TOOL = tool_capabilities['sql']['name']
-        if tool_capabilities['agent']:
-            MCP_AGENT_TOOL = tool_capabilities['agent']['name']
-        
-        logger.info(f"✅ Tool discovery complete: Search={MCP_SEARCH_TOOL}, Analyst={MCP_ANALYST_TOOL}, SQL={MCP_SQL_TOOL}, Agent={MCP_AGENT_TOOL}")
+        # ?refresh=1 bypasses the cache, e.g. after adding tools to the MCP server
+        tool_capabilities = discover_tool_capabilities(refresh=request.args.get('refresh') == '1')
         
         return jsonify({
             'success': True,
@@ -585,58 +768,60 @@ def search_documents():
         
         # Extract the actual content from MCP result
         documents = []
-        if 'content' in result and isinstance(result['content'], list):
-            for item in result['content']:
-                if item.get('type') == 'text' and 'text' in item:
-                    # Try to parse as JSON first (Cortex Search returns JSON structure)
-                    try:
-                        search_results = json.loads(item['text'])
-                        
-                        # Handle Cortex Search format with 'results' array
-                        if isinstance(search_results, dict) and 'results' in search_results:
-                            for result_item in search_results['results']:
-                                documents.append({
-                                    'CONTEXTUALIZED_CHUNK': result_item.get('CONTEXTUALIZED_CHUNK', result_item.get('text', str(result_item))),
-                                    'source': 'cortex_search',
-                                    'metadata': result_item
-                                })
-                        # Handle array of results
-                        elif isinstance(search_results, list):
-                            for result_item in search_results:
-                                if isinstance(result_item, dict):
-                                    documents.append({
-                                        'CONTEXTUALIZED_CHUNK': result_item.get('CONTEXTUALIZED_CHUNK', result_item.get('text', str(result_item))),
-                                        'source': 'cortex_search',
-                                        'metadata': result_item
-                                    })
-                                else:
-                                    documents.append({
-                                        'CONTEXTUALIZED_CHUNK': str(result_item),
-                                        'source': 'cortex_search'
-                                    })
+        for text_content in iter_text_content(result):
+            # Try to parse as JSON first (Cortex Search returns JSON structure)
+            try:
+                search_results = orjson.loads(text_content)
+                
+                # Handle Cortex Search format with 'results' array
+                if isinstance(search_results, dict) and 'results' in search_results:
+                    for result_item in search_results['results']:
+                        documents.append({
+                            'CONTEXTUALIZED_CHUNK': result_item.get('CONTEXTUALIZED_CHUNK', result_item.get('text', str(result_item))),
+                            'source': 'cortex_search',
+                            'metadata': result_item
+                        })
+                # Handle array of results
+                elif isinstance(search_results, list):
+                    for result_item in search_results:
+                        if isinstance(result_item, dict):
+                            documents.append({
+                                'CONTEXTUALIZED_CHUNK': result_item.get('CONTEXTUALIZED_CHUNK', result_item.get('text', str(result_item))),
+                                'source': 'cortex_search',
+                                'metadata': result_item
+                            })
                         else:
-                            # Single result object
                             documents.append({
-                                'CONTEXTUALIZED_CHUNK': str(search_results),
+                                'CONTEXTUALIZED_CHUNK': str(result_item),
                                 'source': 'cortex_search'
                             })
-                    except json.JSONDecodeError:
-                        # If not JSON, treat as plain text result
-                        documents.append({
-                            'CONTEXTUALIZED_CHUNK': item['text'],
-                            'source': 'text_response'
-                        })
+                else:
+                    # Single result object
+                    documents.append({
+                        'CONTEXTUALIZED_CHUNK': str(search_results),
+                        'source': 'cortex_search'
+                    })
+            except orjson.JSONDecodeError:
+                # If not JSON, treat as plain text result
+                documents.append({
+                    'CONTEXTUALIZED_CHUNK': text_content,
+                    'source': 'text_response'
+                })
         
         logger.info(f"✅ Found {len(documents)} search results")
         
-        return jsonify({
+        response = {
             'success': True,
             'results': documents,
             'query': query,
             'tool_used': MCP_SEARCH_TOOL,
-            'raw_mcp_response': result,  # Full raw MCP response for debug mode
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        # The raw MCP payload can be as large as the results; only send it for debug mode
+        if request.args.get('debug') == '1':
+            response['raw_mcp_response'] = result
+        
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"❌ Search error: {e}")
@@ -666,14 +851,18 @@ def analyze_data():
         # Parse the analyst result to extract SQL and execute it
         analysis_result = parse_analyst_result(result, message)
         
-        return jsonify({
+        response = {
             'success': True,
             'results': analysis_result,
             'message': message,
             'tool_used': MCP_ANALYST_TOOL,
-            'raw_mcp_response': result,  # Full raw MCP response for debug mode
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        # The raw MCP payload can be as large as the results; only send it for debug mode
+        if request.args.get('debug') == '1':
+            response['raw_mcp_response'] = result
+        
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"❌ Analysis error: {e}")
@@ -703,14 +892,18 @@ def execute_sql():
         # Process SQL execution results
         sql_result = parse_sql_result(result, sql_query)
         
-        return jsonify({
+        response = {
             'success': True,
             'results': sql_result,
             'sql_query': sql_query,
             'tool_used': MCP_SQL_TOOL,
-            'raw_mcp_response': result,  # Full raw MCP response for debug mode
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        # The raw MCP payload can be as large as the results; only send it for debug mode
+        if request.args.get('debug') == '1':
+            response['raw_mcp_response'] = result
+        
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"❌ SQL execution error: {e}")
@@ -740,14 +933,18 @@ def agent_query():
         # Process agent results
         agent_result = parse_agent_result(result, message)
         
-        return jsonify({
+        response = {
             'success': True,
             'results': agent_result,
             'message': message,
             'tool_used': MCP_AGENT_TOOL,
-            'raw_mcp_response': result,  # Full raw MCP response for debug mode
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        # The raw MCP payload can be as large as the results; only send it for debug mode
+        if request.args.get('debug') == '1':
+            response['raw_mcp_response'] = result
+        
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"❌ Agent query error: {e}")
@@ -757,12 +954,86 @@ def agent_query():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+# Batch tool calls run in parallel, each on its own pooled connection. The cap
+# keeps one batch from tying up the shared pool the other routes rely on
+MAX_BATCH_CALLS = 10
+_BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=MCP_POOL_SIZE, thread_name_prefix='mcp-batch')
+
+@app.route('/api/batch', methods=['POST'])
+def batch_tool_calls():
+    """Run several MCP tool calls concurrently and return all results"""
+    try:
+        data = request.get_json(silent=True)
+        calls = data.get('calls') if isinstance(data, dict) else None
+        
+        if not calls or not isinstance(calls, list):
+            return jsonify({'success': False, 'error': 'A non-empty list of calls is required'}), 400
+        
+        if len(calls) > MAX_BATCH_CALLS:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_CALLS} calls are allowed per batch'}), 400
+        
+        for call in calls:
+            if not (isinstance(call, dict) and isinstance(call.get('name'), str) and call['name']
+                    and isinstance(call.get('arguments', {}), dict)):
+                return jsonify({
+                    'success': False,
+                    'error': 'Each call needs a non-empty string name and an arguments object'
+                }), 400
+        
+        logger.info(f"📦 Batch of {len(calls)} tool calls: {[call.get('name') for call in calls]}")
+        
+        # Total latency is the slowest call rather than the sum of all calls
+        futures = [
+            _BATCH_EXECUTOR.submit(mcp_client.call_tool, call.get('name'), call.get('arguments', {}))
+            for call in calls
+        ]
+        
+        results = []
+        for call, future in zip(calls, futures):
+            try:
+                results.append({
+                    'success': True,
+                    'tool_used': call.get('name'),
+                    'result': future.result()
+                })
+            except Exception as e:
+                logger.error(f"❌ Batch call {call.get('name')} failed: {e}")
+                results.append({
+                    'success': False,
+                    'tool_used': call.get('name'),
+                    'error': str(e)
+                })
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Batch error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+# Health polls share one tools/list result for STATUS_CACHE_TTL seconds;
+# ?fresh=1 always goes to the MCP server
+STATUS_CACHE_TTL = 5
+_STATUS_CACHE = TTLCache(maxsize=1, ttl=STATUS_CACHE_TTL)
+_STATUS_CACHE_LOCK = threading.Lock()
+
 @app.route('/api/status')
 def get_status():
     """Get MCP server connection status"""
     try:
         # Test connection by listing tools
-        tools = mcp_client.list_tools()
+        with _STATUS_CACHE_LOCK:
+            tools = None if request.args.get('fresh') == '1' else _STATUS_CACHE.get('tools')
+            if tools is None:
+                tools = mcp_client.list_tools()
+                _STATUS_CACHE['tools'] = tools
         
         return jsonify({
             'connected': True,
@@ -778,6 +1049,17 @@ def get_status():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.errorhandler(HTTPException)
+def handle_http_error(e: HTTPException):
+    """Return API errors (404, 405, bad JSON, ...) as JSON like the route handlers do"""
+    if not request.path.startswith('/api/'):
+        return e
+    return jsonify({
+        'success': False,
+        'error': e.description,
+        'timestamp': datetime.now().isoformat()
+    }), e.code, [(k, v) for k, v in e.get_headers() if k != 'Content-Type']  # keep e.g. Allow
+
 if __name__ == '__main__':
     logger.info("🚀 Starting Lightweight MCP Client")
     logger.info(f"📡 Connected to: {MCP_SERVER_URL}")
@@ -785,4 +1067,7 @@ if __name__ == '__main__':
     # Force port 5000 only
     port = 5000
     logger.info(f"🌐 Starting server on http://localhost:{port}")
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # Development server only; debugger and reloader are off unless FLASK_DEBUG is
+    # set, which app.run reads itself. For production use:
+    # gunicorn -c gunicorn_conf.py mcp_client:app
+    app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,193 @@
+"""
+Tests for the MCP client's HTTP handling, run against local servers.
+
+Run from the MCP Client directory:
+    python -m unittest discover -s tests
+"""
+
+import functools
+import logging
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import orjson
+import requests
+
+import mcp_client
+
+
+class SSEHandler(BaseHTTPRequestHandler):
+    """Answers each JSON-RPC POST with a chunked SSE stream, as MCP servers do"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        payload = orjson.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        reply = {'jsonrpc': '2.0', 'id': payload['id'], 'result': {'tools': [{'name': 'demo'}]}}
+        event = b'event: message\ndata: ' + orjson.dumps(reply) + b'\n\n'
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.wfile.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(event), event))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_self_signed_pem(directory):
+    """Write a throwaway self-signed certificate and key for 127.0.0.1; return the path"""
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=localhost', '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost',
+        '-keyout', keyfile, '-out', certfile,
+    ], check=True, capture_output=True)
+
+    pem = os.path.join(directory, 'selfsigned.pem')
+    with open(pem, 'wb') as out:
+        for path in (certfile, keyfile):
+            with open(path, 'rb') as part:
+                out.write(part.read())
+    return pem
+
+
+class SelfSignedHTTPSServer(ThreadingHTTPServer):
+    """HTTPS server presenting a self-signed certificate"""
+
+    def __init__(self, server_address, handler, certfile):
+        super().__init__(server_address, handler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+
+def start_server(handler, server_class=ThreadingHTTPServer):
+    server = server_class(('127.0.0.1', 0), handler)
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_client(base_url, scheme='http://'):
+    """MCPClient on its own session and pool, so tests don't share sockets"""
+    session = requests.Session()
+    session.trust_env = False  # Ignore REQUESTS_CA_BUNDLE etc. from the host
+    session.headers.update(mcp_client.MCP_HEADERS)
+    session.mount(scheme, mcp_client.KeepAliveAdapter())
+    client = mcp_client.MCPClient()
+    client.base_url = base_url
+    client.session = session
+    return client
+
+
+class ConnectionReuseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        cls.server = start_server(SSEHandler)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        logging.disable(logging.NOTSET)
+
+    def test_sse_calls_reuse_one_connection(self):
+        client = make_client(f'http://127.0.0.1:{self.server.server_port}/mcp')
+        self.server.connections = 0
+
+        for _ in range(5):
+            self.assertEqual(client.list_tools(), [{'name': 'demo'}])
+
+        self.assertEqual(self.server.connections, 1)
+
+
+@unittest.skipUnless(shutil.which('openssl'), 'openssl CLI is needed to create a test certificate')
+class CertificateVerificationTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.pem = make_self_signed_pem(cls.tempdir.name)
+        cls.server = start_server(SSEHandler, functools.partial(SelfSignedHTTPSServer, certfile=cls.pem))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.tempdir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def test_self_signed_certificate_is_rejected(self):
+        # KeepAliveAdapter.cert_verify clears requests' CA path; verification
+        # must still happen against the shared certifi-backed context
+        client = make_client(f'https://127.0.0.1:{self.server.server_port}/mcp', 'https://')
+
+        with self.assertRaisesRegex(Exception, 'CERTIFICATE_VERIFY_FAILED'):
+            client.list_tools()
+
+    def test_custom_ca_bundle_is_honoured(self):
+        client = make_client(f'https://127.0.0.1:{self.server.server_port}/mcp', 'https://')
+        client.session.verify = self.pem
+
+        self.assertEqual(client.list_tools(), [{'name': 'demo'}])
+
+    def test_verify_false_is_honoured(self):
+        client = make_client(f'https://127.0.0.1:{self.server.server_port}/mcp', 'https://')
+        client.session.verify = False
+
+        self.assertEqual(client.list_tools(), [{'name': 'demo'}])
+
+
+class BatchValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mcp_client.app.test_client()
+        self.called = []
+        patcher = unittest.mock.patch.object(
+            mcp_client.mcp_client, 'call_tool',
+            side_effect=lambda name, arguments: self.called.append(name) or {'content': []}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertRejected(self, body):
+        response = self.client.post('/api/batch', json=body)
+        self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(response.get_json()['success'])
+
+    def test_malformed_calls_are_rejected(self):
+        self.assertRejected(['not', 'an', 'object'])
+        self.assertRejected({'calls': ['x']})
+        self.assertRejected({'calls': [{'arguments': {}}]})
+        self.assertRejected({'calls': [{'name': ''}]})
+        self.assertRejected({'calls': [{'name': 'tool', 'arguments': 'x'}]})
+        self.assertEqual(self.called, [])
+
+    def test_batch_size_is_capped(self):
+        call = {'name': 'tool', 'arguments': {}}
+        self.assertRejected({'calls': [call] * (mcp_client.MAX_BATCH_CALLS + 1)})
+
+        response = self.client.post('/api/batch', json={'calls': [call] * mcp_client.MAX_BATCH_CALLS})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.called), mcp_client.MAX_BATCH_CALLS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,27 +14,17 @@ Output:
 """
 
 import os
-import random
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
 from pathlib import Path
 
-try:
-    import pandas as pd
-    from faker import Faker
-except ImportError:
-    print("Installing required packages...")
-    import subprocess
-    subprocess.check_call(['pip', 'install', 'pandas', 'faker'])
-    import pandas as pd
-    from faker import Faker
-
-# Initialize Faker
-fake = Faker()
-Faker.seed(42)
-random.seed(42)
+# Requires pandas (which installs NumPy); see Step 1 of the demo README
+import numpy as np
+import pandas as pd
 
 # Configuration
 NUM_ROWS = 150
+RANDOM_SEED = 42  # Fixed seed so every run produces the same dataset
 TENANTS = ['TENANT_100', 'TENANT_200', 'TENANT_300']
 
 # Tenant distribution weights (TENANT_100 gets more data and higher sales)
@@ -77,70 +67,71 @@ BASE_PRICES = {
     'Software': (200, 5000)
 }
 
-def generate_tenant_distribution():
-    """Generate weighted tenant distribution."""
-    tenants = []
-    for _ in range(NUM_ROWS):
-        r = random.random()
-        cumulative = 0
-        for tenant, weight in TENANT_WEIGHTS.items():
-            cumulative += weight
-            if r <= cumulative:
-                tenants.append(tenant)
-                break
-    return tenants
-
-def generate_sales_data():
-    """Generate the complete sales dataset."""
-    data = []
-    
-    # Generate tenant distribution
-    tenants = generate_tenant_distribution()
-    
-    # Generate date range (last 12 months)
+# Lookups derived once from the tables above, indexed by product line code
+_LINE_NAMES = list(PRODUCT_LINES)
+_LINE_PRODUCTS = {line: tuple(products) for line, products in PRODUCT_LINES.items()}
+_MIN_PRICES = np.array([BASE_PRICES[line][0] for line in _LINE_NAMES])
+_MAX_PRICES = np.array([BASE_PRICES[line][1] for line in _LINE_NAMES])
+
+# Tenant lookups indexed by tenant code (position in TENANTS)
+_TENANT_PROBS = [TENANT_WEIGHTS[t] for t in TENANTS]
+_TENANT_MULTIPLIERS = np.array([SALES_MULTIPLIERS[t] for t in TENANTS])
+
+def generate_sales_data(rng):
+    """Generate the complete sales dataset, drawing every random column from rng."""
+    # Sequential transaction IDs (TXN-00001, ...) built as one string array
+    trans_ids = np.char.add('TXN-', np.char.zfill(np.arange(1, NUM_ROWS + 1).astype(str), 5))
+    
+    # Weighted tenant distribution, kept as integer codes for array lookups
+    tenant_codes = rng.choice(len(TENANTS), size=NUM_ROWS, p=_TENANT_PROBS)
+    tenants = np.array(TENANTS)[tenant_codes]
+    
+    # Random dates within last 12 months
     end_date = datetime.now()
-    start_date = end_date - timedelta(days=365)
-    
-    for i, tenant in enumerate(tenants):
-        trans_id = f'TXN-{str(i+1).zfill(5)}'
-        
-        # Random date within last 12 months
-        days_ago = random.randint(0, 365)
-        order_date = (end_date - timedelta(days=days_ago)).strftime('%Y-%m-%d')
-        
-        # Select product
-        product_line = random.choice(list(PRODUCT_LINES.keys()))
-        product_name = random.choice(PRODUCT_LINES[product_line])
-        
-        # Select region
-        region = random.choice(REGIONS)
-        
-        # Generate quantity (1-20)
-        quantity = random.randint(1, 20)
-        
-        # Generate base sales amount based on product line
-        min_price, max_price = BASE_PRICES[product_line]
-        base_amount = random.uniform(min_price, max_price)
-        
-        # Apply tenant multiplier (TENANT_100 gets higher sales)
-        sales_amount = round(base_amount * quantity * SALES_MULTIPLIERS[tenant], 2)
-        
-        # Generate profit margin (10-40%)
-        profit_margin = round(random.uniform(0.10, 0.40), 2)
-        
-        data.append({
-            'TRANS_ID': trans_id,
-            'CONTAINER_ID': tenant,
-            'ORDER_DATE': order_date,
-            'PRODUCT_LINE': product_line,
-            'PRODUCT_NAME': product_name,
-            'REGION': region,
-            'QUANTITY': quantity,
-            'SALES_AMOUNT': sales_amount,
-            'PROFIT_MARGIN': profit_margin
-        })
-    
-    return pd.DataFrame(data)
+    days_ago = rng.integers(0, 366, NUM_ROWS)
+    order_dates = (pd.Timestamp(end_date) - pd.to_timedelta(days_ago, unit='D')).strftime('%Y-%m-%d')
+    
+    # Select product line, then a product within each line
+    line_codes = rng.integers(0, len(_LINE_NAMES), NUM_ROWS)
+    product_lines = np.array(_LINE_NAMES)[line_codes]
+    product_names = np.empty(NUM_ROWS, dtype=object)
+    for code, line in enumerate(_LINE_NAMES):
+        mask = line_codes == code
+        product_names[mask] = rng.choice(_LINE_PRODUCTS[line], mask.sum())
+    
+    # Select region
+    regions = rng.choice(REGIONS, NUM_ROWS)
+    
+    # Generate quantity (1-20)
+    quantities = rng.integers(1, 21, NUM_ROWS)
+    
+    # Generate base sales amount based on product line
+    base_amounts = rng.uniform(_MIN_PRICES[line_codes], _MAX_PRICES[line_codes])
+    
+    # Apply tenant multiplier (TENANT_100 gets higher sales)
+    sales_amounts = np.round(base_amounts * quantities * _TENANT_MULTIPLIERS[tenant_codes], 2)
+    
+    # Generate profit margin (10-40%)
+    profit_margins = np.round(rng.uniform(0.10, 0.40, NUM_ROWS), 2)
+    
+    df = pd.DataFrame({
+        'TRANS_ID': trans_ids,
+        'CONTAINER_ID': tenants,
+        'ORDER_DATE': order_dates,
+        'PRODUCT_LINE': product_lines,
+        'PRODUCT_NAME': product_names,
+        'REGION': regions,
+        'QUANTITY': quantities,
+        'SALES_AMOUNT': sales_amounts,
+        'PROFIT_MARGIN': profit_margins
+    })
+    
+    # Compact dtypes: QUANTITY fits in int16, low-cardinality text as categories
+    df['QUANTITY'] = df['QUANTITY'].astype('int16')
+    for col in ('CONTAINER_ID', 'PRODUCT_LINE', 'REGION', 'PRODUCT_NAME'):
+        df[col] = df[col].astype('category')
+    
+    return df
 
 def print_summary(df):
     """Print summary statistics by tenant."""
@@ -148,16 +139,21 @@ def print_summary(df):
     print("SALES DATA SUMMARY BY TENANT")
     print("="*60)
     
-    for tenant in TENANTS:
-        tenant_df = df[df['CONTAINER_ID'] == tenant]
-        total_sales = tenant_df['SALES_AMOUNT'].sum()
-        row_count = len(tenant_df)
-        avg_sale = tenant_df['SALES_AMOUNT'].mean()
-        
+    # One grouped pass over the data instead of a boolean mask per tenant;
+    # reindexing puts the groups in TENANTS order, so skip sorting them.
+    # A tenant with no rows has no group: report 0 rows and $0 (mean stays NaN)
+    stats = (
+        df.groupby('CONTAINER_ID', observed=True, sort=False)['SALES_AMOUNT']
+        .agg(['sum', 'count', 'mean'])
+        .reindex(TENANTS)
+        .fillna({'sum': 0, 'count': 0})
+    )
+    
+    for tenant, tenant_stats in stats.iterrows():
         print(f"\n{tenant}:")
-        print(f"  Rows: {row_count}")
-        print(f"  Total Sales: ${total_sales:,.2f}")
-        print(f"  Avg Sale: ${avg_sale:,.2f}")
+        print(f"  Rows: {int(tenant_stats['count'])}")
+        print(f"  Total Sales: ${tenant_stats['sum']:,.2f}")
+        print(f"  Avg Sale: ${tenant_stats['mean']:,.2f}")
     
     print("\n" + "="*60)
     print(f"TOTAL ROWS: {len(df)}")
@@ -168,7 +164,7 @@ def main():
     print("Generating multi-tenant sales data...")
     
     # Generate data
-    df = generate_sales_data()
+    df = generate_sales_data(np.random.default_rng(RANDOM_SEED))
     
     # Create output directory
     output_dir = Path(__file__).parent.parent / 'data'
@@ -176,7 +172,7 @@ def main():
     
     # Save to CSV
     output_path = output_dir / 'sales_data.csv'
-    df.to_csv(output_path, index=False)
+    df.to_csv(output_path, index=False, lineterminator='\n')
     
     print(f"\nData saved to: {output_path}")
     
@@ -185,7 +181,7 @@ def main():
     
     # Show sample data
     print("\nSample data (first 5 rows):")
-    print(df.head().to_string(index=False))
+    df.head().to_csv(sys.stdout, index=False, lineterminator='\n')
 
 if __name__ == '__main__':
     main()